@@ -6,9 +6,10 @@ import random
 import threading
 from tqdm import tqdm
 from datetime import datetime
+from output_sink import compose_program_frame, open_output_sink
 
 class VideoFrameViewer:
-    def __init__(self, root, video_path):
+    def __init__(self, root, video_path, output_spec=None, output_format="rgb"):
         self.root = root
         self.root.title("video mixer")
         root.config(bg="gray")
@@ -27,6 +28,11 @@ class VideoFrameViewer:
         # Set the canvas
         self.canvas = tk.Canvas(root, width=self.video_width, height=self.video_height, bg='black')
         self.canvas.pack(pady=(20, 0))  
+
+        # Optional program output (named pipe or shared memory) for encoders and other processes
+        self.output_sink = None
+        if output_spec:
+            self.output_sink = open_output_sink(output_spec, int(self.video_width), int(self.video_height), output_format)
        
 
         
@@ -100,6 +106,9 @@ class VideoFrameViewer:
 
         self.canvas.focus_set()
 
+        # Closing the window releases resources the same way as the Terminate button
+        self.root.protocol("WM_DELETE_WINDOW", self.terminate)
+
       
         self.root.after(50, self.update)
 
@@ -137,6 +146,8 @@ class VideoFrameViewer:
         new_height = int(image.height * self.zoom_factor)
         image = image.resize((new_width, new_height))
 
+        self.publish_frame(image)
+
         # Convert the image for Tkinter
         self.tk_image = ImageTk.PhotoImage(image)
 
@@ -150,6 +161,15 @@ class VideoFrameViewer:
             self.canvas.itemconfig(self.canvas_image, image=self.tk_image)
             self.canvas.coords(self.canvas_image, self.offset_x, self.offset_y)
 
+    def publish_frame(self, image):
+        """Send the rendered program frame to the output sink, if one is attached."""
+        if self.output_sink:
+            frame = compose_program_frame(
+                image, self.output_sink.width, self.output_sink.height,
+                self.offset_x, self.offset_y, self.output_sink.pixel_format,
+            )
+            self.output_sink.publish(frame)
+
     def on_zoom(self, event):
         """Zoom in or out based on mouse wheel or key events."""
         if event.delta > 0:
@@ -248,6 +268,9 @@ class VideoFrameViewer:
         self.root.quit()  
         self.root.destroy()  
         release_frames(self.frames)  
+        if self.output_sink:
+            self.output_sink.close()
+            print(f"Output sink: {self.output_sink.stats()}")
 
     def reset(self):
         """Reset the zoom, pan, and frame to their initial state."""
@@ -318,15 +341,19 @@ def load_video_frames(video_path):
 
 
 def release_frames(frames):
-    for frame in frames:
-        frame.release()
+    # Frames are plain numpy arrays, so dropping the references is what frees them
+    frames.clear()
 
 
 if __name__ == "__main__":
     root = tk.Tk()
     video_path = os.path.join("assets", "1.mp4")
     if os.path.exists(video_path):
-        viewer = VideoFrameViewer(root, video_path)
+        viewer = VideoFrameViewer(
+            root, video_path,
+            output_spec=os.environ.get("VIDEO_OUTPUT_SINK"),
+            output_format=os.environ.get("VIDEO_OUTPUT_FORMAT", "rgb"),
+        )
     else:
         print(f"Error: Video file '{video_path}' not found in the assets folder.")
 
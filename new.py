@@ -4,12 +4,13 @@ from PIL import Image, ImageTk
 import cv2
 import os
 import threading
-from tqdm import tqdm
 from datetime import datetime
+from output_sink import compose_program_frame, open_output_sink
+from video_slots import MemoryBudget, VideoSlot, megabytes, probe_video
 import random
 
 class VideoMixerEditor:
-    def __init__(self, root):
+    def __init__(self, root, output_spec=None, output_format="rgb", memory_budget_mb=4096):
         self.root = root
         self.root.title("Video Mixer and Editor")
 
@@ -19,7 +20,8 @@ class VideoMixerEditor:
 
         # Buttons for video uploads
         self.upload_buttons = []
-        self.videos = [None, None, None, None]  # Store video frame sequences
+        self.videos = [None, None, None, None]  # Store a VideoSlot per uploaded video
+        self.memory_budget = MemoryBudget(memory_budget_mb)
         self.current_video_index = 0
         self.current_frame_indexes = [0,0,0,0] # stores current position of each video
 
@@ -28,6 +30,20 @@ class VideoMixerEditor:
             button.grid(row=0, column=i, padx=5)
             self.upload_buttons.append(button)
 
+        # Per-slot memory usage and unload buttons
+        self.memory_labels = []
+        for i in range(4):
+            label = tk.Label(self.upload_frame, text="empty", justify="center")
+            label.grid(row=1, column=i, padx=5)
+            self.memory_labels.append(label)
+
+            unload_button = tk.Button(self.upload_frame, text="Unload", command=lambda idx=i: self.unload_video(idx))
+            unload_button.grid(row=2, column=i, padx=5)
+
+        self.memory_total_label = tk.Label(self.upload_frame)
+        self.memory_total_label.grid(row=3, column=0, columnspan=4)
+        self.update_memory_labels()
+
         # Frame for video playback
         self.playback_frame = tk.Frame(self.root)
         self.playback_frame.pack(side=tk.TOP, pady=10)
@@ -35,6 +51,11 @@ class VideoMixerEditor:
         self.canvas = tk.Canvas(self.playback_frame, width=640, height=480, bg="black")
         self.canvas.pack()
 
+        # Optional program output (named pipe or shared memory) for encoders and other processes
+        self.output_sink = None
+        if output_spec:
+            self.output_sink = open_output_sink(output_spec, 640, 480, output_format)
+
         # Navigation buttons
         self.nav_frame = tk.Frame(self.root)
         self.nav_frame.pack(pady=10)
@@ -90,6 +111,9 @@ class VideoMixerEditor:
         self.canvas.bind("<KeyRelease-f>", self.key_release)
         self.canvas.focus_set()
 
+        # Closing the window releases resources the same way as the Terminate button
+        self.root.protocol("WM_DELETE_WINDOW", self.terminate)
+
         self.root.after(50, self.update)
 
         self.is_playing = False
@@ -143,38 +167,38 @@ class VideoMixerEditor:
     def zoom_in_key(self, event):
         """Zoom in using a keyboard key."""
         self.zoom_factor *= 1.1
-        if self.videos:
+        if self.videos[self.current_video_index]:
             self.display_frame(self.videos[self.current_video_index][self.current_frame_index])
 
     def zoom_out_key(self, event):
         """Zoom out using a keyboard key."""
         self.zoom_factor /= 1.1
-        if self.videos:
+        if self.videos[self.current_video_index]:
             self.display_frame(self.videos[self.current_video_index][self.current_frame_index])
         else:
             print("can't zoom out")
 
     def move_up(self, event):
         self.offset_y -= 10  # Move up
-        if self.videos:
+        if self.videos[self.current_video_index]:
             self.display_frame(self.videos[self.current_video_index][self.current_frame_index])
         
 
     def move_left(self, event):
         self.offset_x -= 10  # Move left
-        if self.videos:
+        if self.videos[self.current_video_index]:
             
             self.display_frame(self.videos[self.current_video_index][self.current_frame_index])
 
     def move_down(self, event):
         self.offset_y += 10  # Move down
-        if self.videos:
+        if self.videos[self.current_video_index]:
             
             self.display_frame(self.videos[self.current_video_index][self.current_frame_index])
 
     def move_right(self, event):
         self.offset_x += 10  # Move right
-        if self.videos:
+        if self.videos[self.current_video_index]:
             
             self.display_frame(self.videos[self.current_video_index][self.current_frame_index])
 
@@ -197,12 +221,72 @@ class VideoMixerEditor:
         if not file_path:
             return
 
-        frames = self.load_video_frames(file_path)
-        if frames:
-            self.videos[index] = frames
-            thumbnail = self.get_thumbnail(frames[0])
+        probe = probe_video(file_path)
+        if probe is None:
+            return
+
+        # Free the clip being replaced before decoding, so both are never held at once
+        self.unload_video(index)
+
+        # Older slots are degraded if the new clip would go over the memory budget
+        mode = self.memory_budget.admit(self.videos, *probe)
+        if mode is None:
+            print(f"Error: Not enough memory budget to load '{file_path}', unload a slot first")
+            self.update_memory_labels()
+            return
+
+        slot = VideoSlot(file_path, *probe, mode=mode, max_decoded_bytes=self.memory_budget.available(self.videos))
+        if slot.mode != mode:
+            # The clip was larger than reported and fell back to on-demand; its cache needs room too
+            mode = self.memory_budget.admit(self.videos, slot.frame_count, slot.width, slot.height, modes=(ON_DEMAND,))
+
+        if mode is None:
+            print(f"Error: Not enough memory budget to load '{file_path}', unload a slot first")
+            slot.unload()
+        elif slot.frame_count <= 0:
+            print(f"Error: No frames found in video file '{file_path}'")
+            slot.unload()
+        else:
+            self.videos[index] = slot
+            slot.pinned = index == self.current_video_index
+            thumbnail = self.get_thumbnail(slot[0])
             self.upload_buttons[index].config(image=thumbnail, text="")
             self.upload_buttons[index].image = thumbnail  # Prevent garbage collection
+        self.update_memory_labels()
+
+    def unload_video(self, index):
+        """Release a slot's frames and return it to the empty state."""
+        slot = self.videos[index]
+        if slot is None:
+            return
+
+        if index == self.current_video_index:
+            # Take it off the canvas so nothing keeps drawing from the released slot
+            self.pause_video()
+            self.current_frame_index = 0
+            if hasattr(self, "canvas_image"):
+                self.canvas.delete(self.canvas_image)
+                del self.canvas_image
+            self.tk_image = None
+
+        slot.unload()
+        self.videos[index] = None
+        self.current_frame_indexes[index] = 0
+        self.upload_buttons[index].config(image="", text=f"Upload Video {index + 1}")
+        self.upload_buttons[index].image = None
+        self.update_memory_labels()
+
+    def update_memory_labels(self):
+        """Show the memory held by each slot and the total against the budget."""
+        for slot, label in zip(self.videos, self.memory_labels):
+            text = slot.describe() if slot is not None else "empty"
+            if label.cget("text") != text:
+                label.config(text=text)
+
+        usage = self.memory_budget.usage(self.videos)
+        text = f"Memory: {megabytes(usage):.1f} / {megabytes(self.memory_budget.limit_bytes):.0f} MB"
+        if self.memory_total_label.cget("text") != text:
+            self.memory_total_label.config(text=text)
 
     def get_thumbnail(self, frame):
         image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -210,26 +294,6 @@ class VideoMixerEditor:
         image = image.resize((160, 120), Image.Resampling.LANCZOS)  # Resize to 4:3 aspect ratio
         return ImageTk.PhotoImage(image)
 
-    def load_video_frames(self, video_path):
-        cap = cv2.VideoCapture(video_path)
-        frames = []
-
-        if not cap.isOpened():
-            print(f"Error: Could not open video file '{video_path}'")
-            return []
-
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        with tqdm(total=total_frames, desc="Loading video frames", unit="frame") as pbar:
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                frames.append(frame)
-                pbar.update(1)
-
-        cap.release()
-        return frames
-
     def display_frame(self, frame):
         image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         image = Image.fromarray(image)
@@ -237,6 +301,8 @@ class VideoMixerEditor:
         new_width = int(image.width * self.zoom_factor)
         new_height = int(image.height * self.zoom_factor)
         image = image.resize((new_width, new_height))
+
+        self.publish_frame(image)
     
         self.tk_image = ImageTk.PhotoImage(image)
         
@@ -250,6 +316,15 @@ class VideoMixerEditor:
             self.canvas.itemconfig(self.canvas_image, image=self.tk_image)
             self.canvas.coords(self.canvas_image, self.offset_x, self.offset_y)
 
+    def publish_frame(self, image):
+        """Send the rendered program frame to the output sink, if one is attached."""
+        if self.output_sink:
+            frame = compose_program_frame(
+                image, self.output_sink.width, self.output_sink.height,
+                self.offset_x, self.offset_y, self.output_sink.pixel_format,
+            )
+            self.output_sink.publish(frame)
+
     def play_video(self):
         if not self.is_playing and self.videos[self.current_video_index]:
             self.is_playing = True
@@ -276,9 +351,16 @@ class VideoMixerEditor:
         self.is_playing = False
         self.play_button.config(state="normal")
         self.pause_button.config(state="disabled")
+        for slot in self.videos:
+            if slot is not None:
+                slot.unload()
+        self.videos = [None, None, None, None]
+        self.tk_image = None
         self.root.quit()  
         self.root.destroy()  
-        # release_frames(self.frames)  
+        if self.output_sink:
+            self.output_sink.close()
+            print(f"Output sink: {self.output_sink.stats()}")
 
     def reset_video(self):
         self.is_playing = True
@@ -292,12 +374,16 @@ class VideoMixerEditor:
             self.display_frame(self.videos[self.current_video_index][self.current_frame_index])
 
     def next_frame(self):
-        if self.current_frame_index < len(self.videos[self.current_video_index]) - 1:
+        if self.videos[self.current_video_index] and self.current_frame_index < len(self.videos[self.current_video_index]) - 1:
             self.current_frame_index += 1
             self.display_frame(self.videos[self.current_video_index][self.current_frame_index])
 
     def switch_video(self, index):
         if self.videos[index]:
+            # Only the slot on air is protected from the memory budget
+            for i, slot in enumerate(self.videos):
+                if slot is not None:
+                    slot.pinned = i == index
             self.current_video_index = index
             self.current_frame_indexes[index] = self.current_frame_index; 
             self.reset_video()
@@ -335,6 +421,9 @@ class VideoMixerEditor:
         if self.key_state['f']:
             self.random_frame()
 
+        # On-demand slots fill their caches during playback
+        self.update_memory_labels()
+
         self.root.after(50, self.update)
 
     def reset(self):
@@ -347,5 +436,10 @@ class VideoMixerEditor:
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = VideoMixerEditor(root)
+    app = VideoMixerEditor(
+        root,
+        output_spec=os.environ.get("VIDEO_OUTPUT_SINK"),
+        output_format=os.environ.get("VIDEO_OUTPUT_FORMAT", "rgb"),
+        memory_budget_mb=float(os.environ.get("VIDEO_MEMORY_BUDGET_MB", 4096)),
+    )
     root.mainloop()
@@ -0,0 +1,299 @@
+import errno
+import os
+import select
+import stat
+import struct
+import threading
+import time
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+
+from PIL import Image
+
+PIXEL_FORMATS = ("rgb", "bgr")
+CHANNELS = 3
+
+# How often a pipe writer waiting on its reader checks whether the sink was closed
+PIPE_POLL_INTERVAL = 0.05
+
+# Each frame on a "seqpipe" is prefixed with: magic, sequence, width, height
+PIPE_FRAME_HEADER = struct.Struct("<4sQII")
+PIPE_FRAME_MAGIC = b"LVEF"
+
+# Shared-memory ring layout:
+#   [0:64)   ring header: magic, pixel format, width, height, channels, slot count,
+#            and the sequence of the last completed frame at WRITE_SEQ_OFFSET
+#   then slot_count slots, each a 64-byte slot header (sequence of the frame
+#   held, 0 while it is being written) followed by the frame bytes
+RING_HEADER = struct.Struct("<8s4sIIII")
+RING_MAGIC = b"LVERING1"
+RING_HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 32
+SLOT_HEADER_SIZE = 64
+SEQ = struct.Struct("<Q")
+
+
+def ring_slot_stride(frame_size):
+    """Bytes used by one ring slot, padded to a 64-byte boundary."""
+    return SLOT_HEADER_SIZE + (frame_size + 63) // 64 * 64
+
+
+def attach_shared_memory(name):
+    """Attach to an existing segment without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment with the resource
+        # tracker, which would unlink it under its owner when we exit
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def compose_program_frame(image, width, height, offset_x, offset_y, pixel_format="rgb"):
+    """Render a zoomed/panned PIL image onto a fixed-size program raster, as raw bytes."""
+    program = Image.new("RGB", (width, height))
+    program.paste(image, (int(offset_x), int(offset_y)))
+    if pixel_format == "bgr":
+        r, g, b = program.split()
+        program = Image.merge("RGB", (b, g, r))
+    return program.tobytes()
+
+
+class OutputSink:
+    """Publishes program frames to a consumer from a background writer thread.
+
+    publish() never blocks on the consumer: frames wait in a short queue and,
+    when it is full, the oldest queued frame is dropped and counted.
+    """
+
+    def __init__(self, width, height, pixel_format="rgb", queue_size=4):
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unknown pixel format '{pixel_format}', expected one of {PIXEL_FORMATS}")
+        self.width = int(width)
+        self.height = int(height)
+        self.pixel_format = pixel_format
+        self.frame_size = self.width * self.height * CHANNELS
+        self.queue_size = queue_size
+
+        self.published = 0  # also the sequence number of the last published frame
+        self.written = 0
+        self.dropped = 0
+
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+
+    def _start(self):
+        self._thread.start()
+
+    def publish(self, data):
+        """Queue one frame of raw bytes (width * height * 3) for the consumer."""
+        if len(data) != self.frame_size:
+            raise ValueError(f"Expected a {self.width}x{self.height} frame of {self.frame_size} bytes, got {len(data)}")
+        if not isinstance(data, bytes):
+            data = bytes(data)
+
+        with self._lock:
+            if self._closed:
+                return
+            self.published += 1
+            if len(self._queue) >= self.queue_size:
+                self._queue.popleft()  # drop the oldest frame rather than stall the UI
+                self.dropped += 1
+            self._queue.append((self.published, data))
+            self._ready.notify()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "published": self.published,
+                "written": self.written,
+                "dropped": self.dropped,
+                "queued": len(self._queue),
+            }
+
+    def close(self, timeout=1.0):
+        """Stop the writer thread and release the pipe or shared memory."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._ready.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    while not self._queue and not self._closed:
+                        self._ready.wait()
+                    if self._closed:
+                        return
+                    sequence, data = self._queue.popleft()
+
+                delivered = self._write(sequence, data)
+                with self._lock:
+                    if delivered:
+                        self.written += 1
+                    else:
+                        self.dropped += 1
+        finally:
+            self._release()
+
+    def _write(self, sequence, data):
+        """Deliver one frame; return False if it could not be delivered."""
+        raise NotImplementedError
+
+    def _release(self):
+        """Free consumer-facing resources; runs on the writer thread."""
+
+
+class PipeSink(OutputSink):
+    """Writes frames to a named pipe (FIFO), e.g. for `ffmpeg -f rawvideo -i <path>`.
+
+    With framed=True each frame is prefixed with PIPE_FRAME_HEADER so a reader
+    can check the sequence; leave it off for plain rawvideo readers.
+    """
+
+    def __init__(self, path, width, height, pixel_format="rgb", framed=False, queue_size=4):
+        super().__init__(width, height, pixel_format, queue_size)
+        self.path = path
+        self.framed = framed
+        self._fd = None
+
+        self._created_fifo = False
+        if not os.path.exists(path):
+            os.mkfifo(path)
+            self._created_fifo = True
+        elif not stat.S_ISFIFO(os.stat(path).st_mode):
+            raise ValueError(f"'{path}' exists and is not a named pipe")
+
+        self._start()
+
+    def _write(self, sequence, data):
+        if self._fd is None:
+            self._fd = self._connect()
+            if self._fd is None:
+                return False
+            print(f"Output sink: reader connected to {self.path}")
+
+        try:
+            if self.framed:
+                header = PIPE_FRAME_HEADER.pack(PIPE_FRAME_MAGIC, sequence, self.width, self.height)
+                if not self._write_all(header):
+                    return False
+            return self._write_all(data)
+        except BrokenPipeError:
+            # The reader went away; wait for the next one on the following frame
+            print(f"Output sink: reader disconnected from {self.path}")
+            os.close(self._fd)
+            self._fd = None
+            return False
+
+    def _connect(self):
+        """Wait for a reader to open the pipe; return the write fd, or None once closed."""
+        # A non-blocking open fails with ENXIO until there is a reader, so poll for one
+        # while frames queued meanwhile are dropped oldest-first
+        while not self._closed:
+            try:
+                return os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as error:
+                if error.errno != errno.ENXIO:
+                    raise
+            time.sleep(PIPE_POLL_INTERVAL)
+        return None
+
+    def _write_all(self, data):
+        """Write all of data, giving up (and returning False) if the sink is closed meanwhile."""
+        view = memoryview(data)
+        while view:
+            if self._closed:
+                return False
+            _, writable, _ = select.select([], [self._fd], [], PIPE_POLL_INTERVAL)
+            if not writable:
+                continue
+            try:
+                written = os.write(self._fd, view)
+            except BlockingIOError:
+                continue
+            view = view[written:]
+        return True
+
+    def _release(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._created_fifo and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class SharedMemoryRingSink(OutputSink):
+    """Writes frames into a multiprocessing.shared_memory ring of `slots` frames.
+
+    The writer never waits for readers. A reader that falls more than `slots`
+    frames behind sees a gap in the sequence numbers.
+    """
+
+    def __init__(self, name, width, height, pixel_format="rgb", slots=8, queue_size=4):
+        super().__init__(width, height, pixel_format, queue_size)
+        self.name = name
+        self.slots = slots
+        self.stride = ring_slot_stride(self.frame_size)
+
+        size = RING_HEADER_SIZE + self.slots * self.stride
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Never remove a segment this process did not create: it may be another editor's live ring
+            existing = attach_shared_memory(name)
+            is_ring = bytes(existing.buf[:len(RING_MAGIC)]) == RING_MAGIC
+            existing.close()
+            owner = "another program output ring" if is_ring else "another shared memory segment"
+            raise FileExistsError(
+                f"Shared memory '{name}' is already used by {owner}; choose another shm name, "
+                f"or remove /dev/shm/{name} if it was left behind by a crashed run"
+            ) from None
+
+        buf = self.shm.buf
+        buf[:RING_HEADER_SIZE] = bytes(RING_HEADER_SIZE)
+        RING_HEADER.pack_into(
+            buf, 0, RING_MAGIC, pixel_format.encode().ljust(4, b"\0"),
+            self.width, self.height, CHANNELS, self.slots,
+        )
+        for slot in range(self.slots):
+            SEQ.pack_into(buf, RING_HEADER_SIZE + slot * self.stride, 0)
+
+        self._start()
+
+    def _write(self, sequence, data):
+        buf = self.shm.buf
+        offset = RING_HEADER_SIZE + (sequence - 1) % self.slots * self.stride
+        SEQ.pack_into(buf, offset, 0)  # mark the slot as being rewritten
+        start = offset + SLOT_HEADER_SIZE
+        buf[start:start + self.frame_size] = data
+        SEQ.pack_into(buf, offset, sequence)
+        SEQ.pack_into(buf, WRITE_SEQ_OFFSET, sequence)
+        return True
+
+    def _release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def open_output_sink(spec, width, height, pixel_format="rgb"):
+    """Create a sink from a spec string: 'pipe:PATH', 'seqpipe:PATH' or 'shm:NAME'."""
+    kind, _, target = spec.partition(":")
+    if not target:
+        raise ValueError(f"Output sink spec '{spec}' is missing a path or name")
+
+    if kind == "pipe":
+        return PipeSink(target, width, height, pixel_format)
+    if kind == "seqpipe":
+        return PipeSink(target, width, height, pixel_format, framed=True)
+    if kind == "shm":
+        return SharedMemoryRingSink(target, width, height, pixel_format)
+    raise ValueError(f"Unknown output sink '{kind}', expected pipe, seqpipe or shm")
@@ -0,0 +1,185 @@
+"""Reference consumer for the program output sink.
+
+Reads frames from a sink created by output_sink.open_output_sink, checks that
+sequence numbers only move forward, counts gaps (frames dropped by the sink or
+overwritten in the ring before we read them) and reports throughput.
+
+    python sink_consumer.py shm:program
+    python sink_consumer.py seqpipe:/tmp/program.fifo
+    python sink_consumer.py pipe:/tmp/program.fifo --size 640x480
+"""
+import argparse
+import os
+import sys
+import time
+
+from output_sink import (
+    CHANNELS,
+    PIPE_FRAME_HEADER,
+    PIPE_FRAME_MAGIC,
+    RING_HEADER,
+    RING_HEADER_SIZE,
+    RING_MAGIC,
+    SEQ,
+    SLOT_HEADER_SIZE,
+    WRITE_SEQ_OFFSET,
+    attach_shared_memory,
+    ring_slot_stride,
+)
+
+
+class FrameStats:
+    def __init__(self, frame_size):
+        self.frame_size = frame_size
+        self.frames = 0
+        self.missing = 0
+        self.out_of_order = 0
+        self.last_sequence = None
+        self.started = time.monotonic()
+        self.window_start = self.started
+        self.window_frames = 0
+
+    def record(self, sequence=None):
+        """Count one frame; sequence is None for plain rawvideo pipes."""
+        if sequence is not None:
+            if self.last_sequence is not None:
+                if sequence <= self.last_sequence:
+                    self.out_of_order += 1
+                    print(f"Out of order: frame {sequence} after {self.last_sequence}")
+                else:
+                    self.missing += sequence - self.last_sequence - 1
+            self.last_sequence = sequence
+        self.frames += 1
+        self.window_frames += 1
+
+        now = time.monotonic()
+        if now - self.window_start >= 1.0:
+            self.report(self.window_frames, now - self.window_start)
+            self.window_start = now
+            self.window_frames = 0
+
+    def report(self, frames, elapsed):
+        fps = frames / elapsed if elapsed else 0.0
+        mb_per_s = fps * self.frame_size / (1024 * 1024)
+        print(f"{fps:7.1f} fps  {mb_per_s:7.1f} MB/s  frames={self.frames} missing={self.missing} out_of_order={self.out_of_order}")
+
+    def summary(self):
+        print("Total:", end=" ")
+        self.report(self.frames, time.monotonic() - self.started)
+
+
+def read_exact(fd, size):
+    chunks = []
+    while size:
+        chunk = os.read(fd, size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def consume_pipe(path, width, height, framed, args):
+    if not framed and not (width and height):
+        sys.exit("A plain pipe carries no header; pass --size WxH")
+
+    print(f"Waiting for the writer on {path}")
+    fd = os.open(path, os.O_RDONLY)
+    stats = None
+    try:
+        while args.frames is None or stats is None or stats.frames < args.frames:
+            sequence = None
+            if framed:
+                header = read_exact(fd, PIPE_FRAME_HEADER.size)
+                if header is None:
+                    break
+                magic, sequence, width, height = PIPE_FRAME_HEADER.unpack(header)
+                if magic != PIPE_FRAME_MAGIC:
+                    sys.exit("Lost frame alignment on the pipe")
+            frame_size = width * height * CHANNELS
+            if stats is None:
+                stats = FrameStats(frame_size)
+            if read_exact(fd, frame_size) is None:
+                break
+            stats.record(sequence)
+            if args.delay:
+                time.sleep(args.delay / 1000)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(fd)
+    return stats
+
+
+def consume_ring(name, args):
+    shm = attach_shared_memory(name)
+    buf = shm.buf
+    magic, pixel_format, width, height, channels, slots = RING_HEADER.unpack_from(buf, 0)
+    if magic != RING_MAGIC:
+        sys.exit(f"'{name}' is not a program output ring")
+    frame_size = width * height * channels
+    stride = ring_slot_stride(frame_size)
+    pixel_format = pixel_format.rstrip(b"\0").decode()
+    print(f"Attached to {name}: {width}x{height} {pixel_format}, {slots} slots")
+
+    stats = FrameStats(frame_size)
+    frame = bytearray(frame_size)
+    next_sequence = SEQ.unpack_from(buf, WRITE_SEQ_OFFSET)[0] + 1
+    try:
+        while args.frames is None or stats.frames < args.frames:
+            latest = SEQ.unpack_from(buf, WRITE_SEQ_OFFSET)[0]
+            if latest < next_sequence:
+                time.sleep(0.001)
+                continue
+            # Skip frames the writer has already lapped (keep one slot of margin)
+            next_sequence = max(next_sequence, latest - slots + 2)
+
+            offset = RING_HEADER_SIZE + (next_sequence - 1) % slots * stride
+            before = SEQ.unpack_from(buf, offset)[0]
+            start = offset + SLOT_HEADER_SIZE
+            frame[:] = buf[start:start + frame_size]
+            after = SEQ.unpack_from(buf, offset)[0]
+            if before == after == next_sequence:
+                stats.record(next_sequence)
+            # Otherwise the slot was overwritten while copying; the gap shows up as missing
+            next_sequence += 1
+            if args.delay:
+                time.sleep(args.delay / 1000)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del buf
+        shm.close()
+    return stats
+
+
+def parse_size(value):
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read and verify frames from the program output sink.")
+    parser.add_argument("spec", help="pipe:PATH, seqpipe:PATH or shm:NAME")
+    parser.add_argument("--size", type=parse_size, default=(0, 0), help="WxH, required for plain pipes")
+    parser.add_argument("--frames", type=int, help="stop after this many frames")
+    parser.add_argument("--delay", type=float, default=0, help="ms to sleep per frame, to simulate a slow consumer")
+    args = parser.parse_args()
+
+    kind, _, target = args.spec.partition(":")
+    if kind in ("pipe", "seqpipe"):
+        stats = consume_pipe(target, *args.size, framed=kind == "seqpipe", args=args)
+    elif kind == "shm":
+        stats = consume_ring(target, args)
+    else:
+        sys.exit(f"Unknown output sink '{kind}', expected pipe, seqpipe or shm")
+
+    if stats is None:
+        print("No frames received")
+        return 1
+    stats.summary()
+    return 1 if stats.out_of_order else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
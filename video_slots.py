@@ -0,0 +1,273 @@
+import itertools
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+# How a slot holds its clip, from most to least memory
+FULL = "full"              # every frame decoded at native size
+DOWNSCALED = "downscaled"  # every frame decoded at DOWNSCALE_FACTOR, upscaled when shown
+ON_DEMAND = "on-demand"    # frames decoded from the file when shown, with a small cache
+
+DOWNSCALE_FACTOR = 0.5
+ON_DEMAND_CACHE_FRAMES = 30
+
+_load_order = itertools.count()
+
+
+def megabytes(nbytes):
+    return nbytes / (1024 * 1024)
+
+
+def count_frames(cap):
+    """Count the frames left in a capture without keeping any of them."""
+    count = 0
+    while cap.grab():
+        count += 1
+    return count
+
+
+def probe_video(video_path):
+    """Return (frame_count, width, height) without decoding, or None if the file can't be opened."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video file '{video_path}'")
+        return None
+
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    return frame_count, width, height
+
+
+def estimate_bytes(frame_count, width, height, mode=FULL):
+    """Bytes a clip would keep resident when loaded in the given mode."""
+    if mode == ON_DEMAND:
+        # An unknown frame count (0 or negative) could still fill the whole cache
+        cache_frames = min(frame_count, ON_DEMAND_CACHE_FRAMES) if frame_count > 0 else ON_DEMAND_CACHE_FRAMES
+        return cache_frames * width * height * 3
+    if mode == DOWNSCALED:
+        width = int(width * DOWNSCALE_FACTOR)
+        height = int(height * DOWNSCALE_FACTOR)
+    return frame_count * width * height * 3
+
+
+class VideoSlot:
+    """One uploaded clip with its memory accounting.
+
+    Indexing returns native-size BGR frames whatever the mode, so callers can
+    treat a slot like the list of frames it replaces.
+    """
+
+    def __init__(self, video_path, frame_count, width, height, mode=FULL, max_decoded_bytes=None):
+        self.video_path = video_path
+        self.frame_count = frame_count
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.pinned = False  # the slot on air is never degraded to make room
+        self.loaded_at = next(_load_order)
+
+        self.frames = None
+        self.decoded_bytes = 0
+        self._cache = OrderedDict()
+        self.cached_bytes = 0
+        self._capture = None
+        self._capture_position = None
+
+        if mode != ON_DEMAND:
+            self._decode(max_decoded_bytes)
+        elif frame_count <= 0:
+            # The container doesn't know its length; on-demand indexing needs it
+            cap = cv2.VideoCapture(self.video_path)
+            self.frame_count = count_frames(cap)
+            cap.release()
+
+    def _decode(self, max_decoded_bytes=None):
+        """Decode every frame, falling back to on-demand if they pass max_decoded_bytes."""
+        cap = cv2.VideoCapture(self.video_path)
+        scale = DOWNSCALE_FACTOR if self.mode == DOWNSCALED else 1.0
+        size = (int(self.width * scale), int(self.height * scale))
+        frames = []
+        decoded_bytes = 0
+
+        with tqdm(total=self.frame_count, desc=f"Loading video frames ({self.mode})", unit="frame") as pbar:
+            while cap.isOpened():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if scale != 1.0:
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                frames.append(frame)
+                decoded_bytes += frame.nbytes
+                pbar.update(1)
+
+                if max_decoded_bytes is not None and decoded_bytes > max_decoded_bytes:
+                    # The container under-reported its length; stop before going over the budget
+                    print(f"Memory budget: {self.video_path} is larger than reported, decoding it on demand")
+                    decoded_count = len(frames)
+                    frames = None  # free the decoded frames before scanning the rest of the file
+                    self.mode = ON_DEMAND
+                    self.frame_count = decoded_count + count_frames(cap)
+                    cap.release()
+                    return
+
+        cap.release()
+        self.frames = frames
+        self.frame_count = len(frames)  # the container's frame count is only an estimate
+        self.decoded_bytes = decoded_bytes
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, index):
+        if self.mode == FULL:
+            return self.frames[index]
+        if self.mode == DOWNSCALED:
+            return cv2.resize(self.frames[index], (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+        return self._read_frame(index)
+
+    def _read_frame(self, index):
+        """Decode a single frame from the file, keeping the most recent ones cached."""
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+
+        if self._capture is None:
+            self._capture = cv2.VideoCapture(self.video_path)
+            self._capture_position = 0
+        if index != self._capture_position:
+            # Seeking is slow, so only do it when not reading sequentially (e.g. during playback)
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = self._capture.read()
+        if not ret:
+            self._capture_position = None
+            return np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self._capture_position = index + 1
+
+        self._cache[index] = frame
+        self.cached_bytes += frame.nbytes
+        while len(self._cache) > ON_DEMAND_CACHE_FRAMES:
+            _, evicted = self._cache.popitem(last=False)
+            self.cached_bytes -= evicted.nbytes
+        return frame
+
+    @property
+    def total_bytes(self):
+        return self.decoded_bytes + self.cached_bytes
+
+    @property
+    def reserved_bytes(self):
+        """Bytes the budget holds for this slot, including room for a full on-demand cache."""
+        if self.mode == ON_DEMAND:
+            return max(self.cached_bytes, estimate_bytes(self.frame_count, self.width, self.height, ON_DEMAND))
+        return self.total_bytes
+
+    @property
+    def pinned_bytes(self):
+        return self.total_bytes if self.pinned else 0
+
+    def downscale(self):
+        """Shrink the decoded frames to DOWNSCALE_FACTOR of their size."""
+        if self.mode != FULL:
+            return
+        size = (int(self.width * DOWNSCALE_FACTOR), int(self.height * DOWNSCALE_FACTOR))
+        # Replace in place so each full-size frame is freed as soon as it is shrunk
+        for i, frame in enumerate(self.frames):
+            self.frames[i] = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        self.decoded_bytes = sum(frame.nbytes for frame in self.frames)
+        self.mode = DOWNSCALED
+
+    def evict(self):
+        """Drop the decoded frames and decode from the file when frames are shown."""
+        if self.mode == ON_DEMAND:
+            return
+        self.frames = None
+        self.decoded_bytes = 0
+        self.mode = ON_DEMAND
+
+    def unload(self):
+        """Release everything the slot holds."""
+        self.frames = None
+        self.decoded_bytes = 0
+        self._cache.clear()
+        self.cached_bytes = 0
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def describe(self):
+        """Short per-slot usage report for the UI."""
+        if self.mode == DOWNSCALED:
+            resolution = f"{int(self.width * DOWNSCALE_FACTOR)}x{int(self.height * DOWNSCALE_FACTOR)}"
+        else:
+            resolution = f"{self.width}x{self.height}"
+        return (
+            f"{self.mode} {resolution}\n"
+            f"decoded {megabytes(self.decoded_bytes):.1f} MB\n"
+            f"cached {megabytes(self.cached_bytes):.1f} MB\n"
+            f"pinned {megabytes(self.pinned_bytes):.1f} MB"
+        )
+
+
+class MemoryBudget:
+    """Global limit on memory held by all slots, enforced when a clip is loaded."""
+
+    def __init__(self, limit_mb):
+        self.limit_bytes = int(limit_mb * 1024 * 1024)
+
+    def usage(self, slots):
+        return sum(slot.reserved_bytes for slot in slots if slot is not None)
+
+    def available(self, slots):
+        return self.limit_bytes - self.usage(slots)
+
+    def admit(self, slots, frame_count, width, height, modes=(FULL, DOWNSCALED, ON_DEMAND)):
+        """Make room for a new clip and return the mode it should be loaded in.
+
+        The plan degrades older unpinned slots oldest first, downscaling them
+        before evicting them to on-demand decoding, and uses the shortest part
+        of it that lets the new clip load in its best mode out of `modes`.
+        Nothing is degraded unless that gets the new clip a better mode than it
+        would get anyway. Returns None if even the whole plan can't make room.
+        """
+        if frame_count <= 0:
+            # Without a frame count there is no way to tell whether a full decode fits
+            modes = (ON_DEMAND,)
+
+        victims = sorted((slot for slot in slots if slot is not None and not slot.pinned), key=lambda slot: slot.loaded_at)
+        candidates = [(slot, DOWNSCALED) for slot in victims if slot.mode == FULL]
+        candidates += [(slot, ON_DEMAND) for slot in victims if slot.mode != ON_DEMAND]
+
+        # Projected usage after each step of the plan, skipping steps that save nothing
+        reserved = {slot: slot.reserved_bytes for slot in victims}
+        usage = self.usage(slots)
+        steps = []
+        projected = [usage]
+        for slot, mode in candidates:
+            after = estimate_bytes(slot.frame_count, slot.width, slot.height, mode)
+            if after >= reserved[slot]:
+                continue
+            usage += after - reserved[slot]
+            reserved[slot] = after
+            steps.append((slot, mode))
+            projected.append(usage)
+
+        for mode in modes:
+            needed = estimate_bytes(frame_count, width, height, mode)
+            for count, usage in enumerate(projected):
+                if usage + needed <= self.limit_bytes:
+                    # Collapse the steps per slot so a slot that ends up evicted is never downscaled first
+                    targets = {}
+                    for slot, target in steps[:count]:
+                        targets[slot] = target
+                    for slot, target in targets.items():
+                        if target == DOWNSCALED:
+                            slot.downscale()
+                        else:
+                            slot.evict()
+                        print(f"Memory budget: {slot.video_path} is now {slot.mode}")
+                    return mode
+        return None